@@ -2,29 +2,184 @@
 
 import sys
 import os
+import subprocess
 import json
-import base64
-import hashlib
+import time
+import functools
+import itertools
+import xxhash
+from collections import deque
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                              QListWidget, QListWidgetItem, QPushButton, QLabel, 
                              QSystemTrayIcon, QMenu, QAction, QDialog, QLineEdit,
                              QMessageBox, QWidget)
 from PyQt5.QtGui import QIcon, QPixmap, QImage
-from PyQt5.QtCore import Qt, QTimer, QMimeData
-import pyperclip
+from PyQt5.QtCore import (Qt, QTimer, QMimeData, QBuffer, QIODevice, QObject,
+                          QRunnable, QThreadPool, pyqtSignal)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+HASH_CHUNK_SIZE = 64 * 1024
+IMAGE_CACHE_DIR = os.path.expanduser('~/.clipboard_manager_images')
+TEXT_CACHE_DIR = os.path.expanduser('~/.clipboard_manager_text')
+TEXT_SIDECAR_THRESHOLD = 4096
+TEXT_PREVIEW_LENGTH = 256
+
+def json_dumps(obj, indent=False):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+@functools.lru_cache(maxsize=None)
+def pynput_keyboard():
+    from pynput import keyboard
+    return keyboard
+
+def write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb', buffering=1 << 20) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_json_atomic(path, obj):
+    write_atomic(path, json_dumps(obj, indent=True))
 
 class ClipboardItem:
-    def __init__(self, content, content_type):
-        self.id = hashlib.md5(str(content).encode()).hexdigest()
-        self.content = content
+    def __init__(self, content, content_type, item_id=None):
+        if item_id is not None:
+            self.id = item_id
+        elif content_type == 'image':
+            self.id = self._hash_bytes(content)
+        else:
+            self.id = xxhash.xxh3_128_hexdigest(content.encode('utf-8'))
+        self._content = content
+        self._thumb_icon = None
+        self._thumb_image = None
         self.type = content_type
-        self.timestamp = os.path.getmtime(os.path.realpath(__file__))
+        self.timestamp = time.time()
+        self.content_ref = None
+        self.content_preview = None
+        if content_type == 'image':
+            self.content_ref = self.id
+        elif content is not None and len(content) > TEXT_SIDECAR_THRESHOLD:
+            self.content_ref = self.id
+            self.content_preview = content[:TEXT_PREVIEW_LENGTH]
+
+    @staticmethod
+    def _hash_bytes(content):
+        h = xxhash.xxh3_128()
+        mv = memoryview(content)
+        for i in range(0, len(mv), HASH_CHUNK_SIZE):
+            h.update(mv[i:i + HASH_CHUNK_SIZE])
+        return h.hexdigest()
+
+    @property
+    def sidecar_path(self):
+        if self.type == 'image':
+            return os.path.join(IMAGE_CACHE_DIR, f'{self.id}.bin')
+        return os.path.join(TEXT_CACHE_DIR, f'{self.id}.txt')
+
+    @property
+    def thumbnail_path(self):
+        return os.path.join(IMAGE_CACHE_DIR, f'{self.id}.thumb.png')
+
+    @property
+    def content(self):
+        if self._content is not None or self.content_ref is None:
+            return self._content
+        try:
+            if self.type == 'image':
+                with open(self.sidecar_path, 'rb') as f:
+                    self._content = f.read()
+                return self._content
+            with open(self.sidecar_path, 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def is_available(self):
+        return self._content is not None or self.content_ref is None or os.path.exists(self.sidecar_path)
+
+    @property
+    def display_text(self):
+        text = self.content_preview if self.content_preview is not None else self.content
+        return text[:50] + '...' if len(text) > 50 else text
+
+    def write_sidecar(self):
+        if self._content is None:
+            return
+        path = self.sidecar_path
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.type == 'image':
+                write_atomic(path, self._content)
+            else:
+                write_atomic(path, self._content.encode('utf-8'))
+        if self.type == 'text':
+            self._content = None
+
+    def remove_sidecar(self):
+        if self.content_ref is None:
+            return
+        paths = [self.sidecar_path]
+        if self.type == 'image':
+            paths.append(self.thumbnail_path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def thumbnail(self):
+        if self._thumb_icon is None:
+            if self._thumb_image is not None:
+                pixmap = QPixmap.fromImage(self._thumb_image)
+                self._thumb_image = None
+            else:
+                pixmap = QPixmap(self.thumbnail_path)
+            if pixmap.isNull() and self.content is not None:
+                qimage = QImage.fromData(self.content)
+                pixmap = QPixmap.fromImage(qimage).scaled(
+                    100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation
+                )
+            if not pixmap.isNull() and not os.path.exists(self.thumbnail_path):
+                os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+                tmp_path = self.thumbnail_path + '.tmp'
+                if pixmap.save(tmp_path, 'PNG'):
+                    os.replace(tmp_path, self.thumbnail_path)
+            self._thumb_icon = QIcon(pixmap)
+        return self._thumb_icon
 
     def to_dict(self):
         if self.type == 'image':
+            self.write_sidecar()
             return {
                 'id': self.id,
-                'content': base64.b64encode(self.content).decode(),
+                'content_ref': self.content_ref,
+                'type': self.type,
+                'timestamp': self.timestamp
+            }
+        if self.content_ref is not None:
+            self.write_sidecar()
+            return {
+                'id': self.id,
+                'content_ref': self.content_ref,
+                'content_preview': self.content_preview,
                 'type': self.type,
                 'timestamp': self.timestamp
             }
@@ -37,20 +192,55 @@ class ClipboardItem:
 
     @classmethod
     def from_dict(cls, data):
-        item = cls(data['content'], data['type'])
-        item.id = data['id']
+        content = data.get('content')
+        if data['type'] == 'image' and content is not None:
+            content = base64.b64decode(content)
+        item = cls(content, data['type'], item_id=data['id'])
         item.timestamp = data.get('timestamp', item.timestamp)
-        if item.type == 'image':
-            item.content = base64.b64decode(data['content'])
+        if 'content_ref' in data:
+            item.content_ref = data['content_ref']
+            item.content_preview = data.get('content_preview')
         return item
 
+class ClipTaskSignals(QObject):
+    finished = pyqtSignal(object)
+
+class ClipTask(QRunnable):
+    def __init__(self, content, content_type):
+        super().__init__()
+        self.content = content
+        self.type = content_type
+        self.signals = ClipTaskSignals()
+
+    def run(self):
+        if self.type == 'image':
+            qimage = self.content
+            buf = QBuffer()
+            buf.open(QIODevice.WriteOnly)
+            qimage.save(buf, 'PNG')
+            item = ClipboardItem(bytes(buf.data()), 'image')
+            item._thumb_image = qimage.scaled(
+                100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation
+            )
+        else:
+            item = ClipboardItem(self.content, self.type)
+        self.signals.finished.emit(item)
+
 class ClipboardManager(QMainWindow):
     def __init__(self, max_items=10):
         super().__init__()
         self.max_items = max_items
         self.clipboard = QApplication.clipboard()
-        self.history = []
+        self.history = deque(maxlen=self.max_items)
+        self._id_index = {}
         self.config_path = os.path.expanduser('~/.clipboard_manager_config.json')
+        self.history_log_path = os.path.expanduser('~/.clipboard_manager_history.jsonl')
+        self._history_dirty = False
+        self._pending_log = []
+        self._log_seq = 0
+        self._evicted = []
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
         self.keybindings_path = os.path.expanduser('~/.clipboard_manager_keybindings.json')
         
         self.default_keybindings = {
@@ -60,29 +250,35 @@ class ClipboardManager(QMainWindow):
         }
         self.keybindings = {}
         self.listener = None
+        self._kbd = None
+        self._last_text = None
+        self._last_image_fast_hash = None
         
         self.load_config()
         self.load_keybindings()
         self.init_ui()
         self.setup_system_tray()
-        self.setup_global_hotkeys()
+        QTimer.singleShot(0, self.setup_global_hotkeys)
+        self.start_snapshots()
         self.start_monitoring()
 
     def load_keybindings(self):
         try:
-            with open(self.keybindings_path, 'r') as f:
-                self.keybindings = json.load(f)
+            with open(self.keybindings_path, 'rb') as f:
+                self.keybindings = json_loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
             self.keybindings = self.default_keybindings
             self.save_keybindings()
 
     def save_keybindings(self):
-        with open(self.keybindings_path, 'w') as f:
-            json.dump(self.keybindings, f, indent=2)
+        write_json_atomic(self.keybindings_path, self.keybindings)
 
     def setup_global_hotkeys(self):
         try:
-            from pynput import keyboard
+            keyboard = pynput_keyboard()
+            
+            if self._kbd is None:
+                self._kbd = keyboard.Controller()
             
             if self.listener:
                 self.listener.stop()
@@ -109,16 +305,29 @@ class ClipboardManager(QMainWindow):
     def paste_last_item(self):
         if self.history:
             last_item = self.history[0]
+            if last_item.content is None:
+                return
             if last_item.type == 'text':
                 self.clipboard.setText(last_item.content)
                 if sys.platform == 'linux':
-                    os.system('xdotool key ctrl+v')
+                    self.send_paste_keystroke()
             elif last_item.type == 'image':
                 qimage = QImage.fromData(last_item.content)
                 mime_data = QMimeData()
                 mime_data.setImageData(qimage)
                 self.clipboard.setMimeData(mime_data)
 
+    def send_paste_keystroke(self):
+        if self._kbd is not None:
+            with self._kbd.pressed(pynput_keyboard().Key.ctrl):
+                self._kbd.press('v')
+                self._kbd.release('v')
+        else:
+            try:
+                subprocess.Popen(['xdotool', 'key', 'ctrl+v'])
+            except FileNotFoundError:
+                pass
+
     def init_ui(self):
         self.setWindowTitle('Advanced Clipboard Manager')
         self.setGeometry(100, 100, 600, 400)
@@ -208,60 +417,92 @@ class ClipboardManager(QMainWindow):
         self.tray_icon.show()
 
     def start_monitoring(self):
-        self.clipboard_timer = QTimer(self)
-        self.clipboard_timer.timeout.connect(self.check_clipboard)
-        self.clipboard_timer.start(500)
+        self.clipboard.dataChanged.connect(self.check_clipboard)
+        QTimer.singleShot(0, self.check_clipboard)
+        
+        # Background clients are not told about selection changes on Wayland
+        if QApplication.platformName() == 'wayland' or os.environ.get('XDG_SESSION_TYPE') == 'wayland':
+            self.clipboard_timer = QTimer(self)
+            self.clipboard_timer.timeout.connect(self.check_clipboard)
+            self.clipboard_timer.start(2000)
 
     def check_clipboard(self):
         mime_data = self.clipboard.mimeData()
+        formats = mime_data.formats()
         
-        if mime_data.hasText():
+        if 'text/plain' in formats or 'text/uri-list' in formats:
             text = mime_data.text()
+            if text == self._last_text:
+                return
+            self._last_text = text
+            self._last_image_fast_hash = None
             self.add_item(text, 'text')
-        elif mime_data.hasImage():
+        elif 'application/x-qt-image' in formats:
             image = mime_data.imageData()
-            qimage = image.convertToFormat(QImage.Format_RGBA8888)
-            image_bytes = qimage.bits().asstring(qimage.byteCount())
-            self.add_item(image_bytes, 'image')
+            if image is None or image.isNull():
+                return
+            pixels = image.constBits()
+            pixels.setsize(image.byteCount())
+            fast_hash = xxhash.xxh3_64_intdigest(memoryview(pixels))
+            if fast_hash == self._last_image_fast_hash:
+                return
+            self._last_image_fast_hash = fast_hash
+            self._last_text = None
+            self.add_item(image, 'image')
 
     def add_item(self, content, content_type):
-        item = ClipboardItem(content, content_type)
-        
-        if any(existing.id == item.id for existing in self.history):
+        task = ClipTask(content, content_type)
+        task.signals.finished.connect(self._add_ready_item)
+        self.thread_pool.start(task)
+
+    def _add_ready_item(self, item):
+        if not self._insert_item(item):
             return
         
-        self.history.insert(0, item)
-        
-        if len(self.history) > self.max_items:
-            self.history = self.history[:self.max_items]
+        self.clip_list.insertItem(0, self._make_list_item(item))
+        if self.clip_list.count() > self.history.maxlen:
+            self.clip_list.takeItem(self.history.maxlen)
+        self.append_history(item)
+
+    def _insert_item(self, item):
+        if item.id in self._id_index:
+            return False
         
-        self.populate_list()
-        self.save_config()
+        if len(self.history) == self.history.maxlen:
+            evicted = self.history[-1]
+            del self._id_index[evicted.id]
+            if evicted in self._pending_log:
+                self._pending_log.remove(evicted)
+            self._evicted.append(evicted)
+        self.history.appendleft(item)
+        self._id_index[item.id] = item
+        return True
 
     def populate_list(self):
         self.clip_list.clear()
         
         for item in self.history:
-            list_item = QListWidgetItem()
-            
-            if item.type == 'text':
-                display_text = item.content[:50] + '...' if len(item.content) > 50 else item.content
-                list_item.setText(display_text)
-            elif item.type == 'image':
-                qimage = QImage.fromData(item.content)
-                pixmap = QPixmap.fromImage(qimage).scaled(
-                    100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
-                list_item.setIcon(QIcon(pixmap))
-                list_item.setText('Image')
-            
-            self.clip_list.addItem(list_item)
+            self.clip_list.addItem(self._make_list_item(item))
+
+    def _make_list_item(self, item):
+        list_item = QListWidgetItem()
+        
+        if item.type == 'text':
+            list_item.setText(item.display_text)
+        elif item.type == 'image':
+            list_item.setIcon(item.thumbnail())
+            list_item.setText('Image')
+        
+        return list_item
 
     def restore_item(self, item):
         index = self.clip_list.row(item)
         selected_item = self.history[index]
+        if selected_item.content is None:
+            return
         
         if selected_item.type == 'text':
+            import pyperclip
             pyperclip.copy(selected_item.content)
         elif selected_item.type == 'image':
             qimage = QImage.fromData(selected_item.content)
@@ -270,30 +511,100 @@ class ClipboardManager(QMainWindow):
             self.clipboard.setMimeData(mime_data)
 
     def clear_history(self):
+        self._evicted.extend(self.history)
         self.history.clear()
+        self._last_text = None
+        self._last_image_fast_hash = None
+        self._id_index.clear()
         self.clip_list.clear()
         self.save_config()
 
     def load_config(self):
+        snapshot_seq = -1
         try:
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
-                self.history = [ClipboardItem.from_dict(item) for item in config.get('history', [])]
+            with open(self.config_path, 'rb') as f:
+                config = json_loads(f.read())
                 self.max_items = config.get('max_items', 10)
+                snapshot_seq = config.get('log_seq', -1)
+                items = (ClipboardItem.from_dict(item) for item in config.get('history', []))
+                self.history = deque(
+                    itertools.islice((item for item in items if item.is_available()), self.max_items),
+                    maxlen=self.max_items
+                )
         except (FileNotFoundError, json.JSONDecodeError):
-            self.history = []
+            self.history = deque(maxlen=self.max_items)
+        self._id_index = {item.id: item for item in self.history}
+        self._log_seq = max(snapshot_seq, 0)
+        self.replay_history_log(snapshot_seq)
+
+    def replay_history_log(self, snapshot_seq):
+        try:
+            with open(self.history_log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        data = json_loads(line)
+                        seq = data.get('seq', 0)
+                        item = ClipboardItem.from_dict(data)
+                    except (json.JSONDecodeError, KeyError, AttributeError):
+                        continue
+                    self._log_seq = max(self._log_seq, seq)
+                    # Entries up to the snapshot's marker are already part of it
+                    if seq <= snapshot_seq:
+                        continue
+                    if item.is_available() and self._insert_item(item):
+                        self._history_dirty = True
+        except FileNotFoundError:
+            pass
+
+    def append_history(self, item):
+        self._pending_log.append(item)
+        self._history_dirty = True
+        self._save_timer.start(1000)
+
+    def write_pending_log(self):
+        if not self._pending_log:
+            return
+        with open(self.history_log_path, 'ab') as f:
+            for item in self._pending_log:
+                self._log_seq += 1
+                entry = item.to_dict()
+                entry['seq'] = self._log_seq
+                f.write(json_dumps(entry) + b'\n')
+        self._pending_log.clear()
+
+    def start_snapshots(self):
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.timeout.connect(self.write_pending_log)
+        self.snapshot_timer = QTimer(self)
+        self.snapshot_timer.timeout.connect(self.flush_history)
+        self.snapshot_timer.start(30000)
+        QApplication.instance().aboutToQuit.connect(self.flush_history)
+
+    def flush_history(self):
+        if self._history_dirty:
+            self.save_config()
 
     def save_config(self):
         config = {
             'history': [item.to_dict() for item in self.history],
-            'max_items': self.max_items
+            'max_items': self.max_items,
+            'log_seq': self._log_seq
         }
-        with open(self.config_path, 'w') as f:
-            json.dump(config, f, indent=2)
+        write_json_atomic(self.config_path, config)
+        with open(self.history_log_path, 'w'):
+            pass
+        self._pending_log.clear()
+        self._history_dirty = False
+        for item in self._evicted:
+            if item.id not in self._id_index:
+                item.remove_sidecar()
+        self._evicted.clear()
 
     def closeEvent(self, event):
         if self.listener:
             self.listener.stop()
+        self.flush_history()
         event.accept()
 
 def main():
@@ -116,7 +116,7 @@ log "INFO" "Installing Python packages..."
 sudo -u "$CURRENT_USER" bash <<EOF
 source "$VENV_DIR/bin/activate"
 pip install --upgrade pip || { echo "Failed to upgrade pip"; exit 1; }
-pip install PyQt5 pyperclip pynput || { echo "Failed to install Python packages"; exit 1; }
+pip install PyQt5 pyperclip pynput xxhash orjson || { echo "Failed to install Python packages"; exit 1; }
 deactivate
 EOF
 